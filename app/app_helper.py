@@ -1,5 +1,7 @@
-from functools import reduce
-from collections import defaultdict
+import hashlib
+import threading
+from operator import methodcaller
+from cachetools import LRUCache
 from ne_span import NESpan
 
 
@@ -8,16 +10,64 @@ LABEL2TYPE = {
     'מקור': 'citation',
     'Citation': 'citation',
 }
+# frozenset membership is a single hash lookup in the per-span hot loop
+CITATION_LABELS = frozenset(label for label, type_ in LABEL2TYPE.items() if type_ == 'citation')
 
+# Serving workloads see repeated inputs (re-indexing, retries, duplicate texts
+# in bulk requests); a cache hit skips both model forward passes entirely.
+RESULT_CACHE_SIZE = 10_000
+_result_cache = LRUCache(maxsize=RESULT_CACHE_SIZE)
+_result_cache_lock = threading.Lock()
 
-def make_recognize_entities_output(text, ner_model, ref_part_model, with_span_text=False):
-    cit_spans, ref_parts_list, other_spans = _get_linker_entities(text, ner_model, ref_part_model)
-    return _serialize_linker_entities(cit_spans, ref_parts_list, other_spans, with_span_text)
+
+def _cache_key(lang, text, with_span_text):
+    return lang, hashlib.blake2b(text.encode(), digest_size=16).digest(), with_span_text
 
 
-def make_bulk_recognize_entities_output(texts, ner_model, ref_part_model, with_span_text=False):
-    results = _bulk_get_linker_entities(texts, ner_model, ref_part_model)
-    return _bulk_serialize_linker_entities(results, with_span_text)
+def make_recognize_entities_output(text, ner_model, ref_part_model, with_span_text=False, lang=None):
+    key = _cache_key(lang, text, with_span_text)
+    with _result_cache_lock:
+        cached = _result_cache.get(key)
+    if cached is not None:
+        return cached
+    cit_spans, ref_parts_list, other_spans = _get_linker_entities(text, ner_model, ref_part_model)
+    result = _serialize_linker_entities(cit_spans, ref_parts_list, other_spans, with_span_text)
+    with _result_cache_lock:
+        _result_cache[key] = result
+    return result
+
+
+def make_bulk_recognize_entities_output(texts, ner_model, ref_part_model, with_span_text=False, lang=None):
+    serial = [None] * len(texts)
+    # Deduplicate before touching the models: identical texts (and texts
+    # already in the cache) only run through the pipeline once
+    miss_indices_by_key = {}
+    miss_texts = []
+    keys = [_cache_key(lang, text, with_span_text) for text in texts]
+    with _result_cache_lock:
+        cached_results = [_result_cache.get(key) for key in keys]
+    for i, (text, key, cached) in enumerate(zip(texts, keys, cached_results)):
+        if cached is not None:
+            serial[i] = cached
+            continue
+        if key not in miss_indices_by_key:
+            miss_indices_by_key[key] = []
+            miss_texts.append(text)
+        miss_indices_by_key[key].append(i)
+    if miss_texts:
+        results = _bulk_get_linker_entities(miss_texts, ner_model, ref_part_model)
+        # Serialize outside the lock — only the cache writes need it
+        computed = {}
+        # miss_indices_by_key preserves insertion order, matching miss_texts
+        for key, result_tuple in zip(miss_indices_by_key, results):
+            serialized = _serialize_linker_entities(*result_tuple, with_span_text)
+            computed[key] = serialized
+            for i in miss_indices_by_key[key]:
+                serial[i] = serialized
+        with _result_cache_lock:
+            for key, serialized in computed.items():
+                _result_cache[key] = serialized
+    return {'results': serial}
 
 
 def _get_linker_entities(text: str, ner_model, ref_part_model):
@@ -38,51 +88,83 @@ def _get_linker_entities(text: str, ner_model, ref_part_model):
 
 def _partition_spans(spans: list[NESpan]):
     cit_spans, other_spans = [], []
+    add_cit, add_other = cit_spans.append, other_spans.append
     for span in spans:
-        if LABEL2TYPE.get(span.label) == 'citation':
-            cit_spans.append(span)
-        else:
-            other_spans.append(span)
+        (add_cit if span.label in CITATION_LABELS else add_other)(span)
     return cit_spans, other_spans
 
 
-def _bulk_partition_spans(spans_list: list[list[NESpan]]):
-    cit_spans_list, other_spans_list = [], []
-    for spans in spans_list:
-        inner_cit_spans, inner_other_spans = _partition_spans(spans)
-        cit_spans_list += [inner_cit_spans]
-        other_spans_list += [inner_other_spans]
-    return cit_spans_list, other_spans_list
-
-
 def _bulk_get_linker_entities(texts, ner_model, ref_part_model):
+    if hasattr(ner_model, 'submit') and hasattr(ref_part_model, 'submit'):
+        return _bulk_get_linker_entities_pipelined(texts, ner_model, ref_part_model)
     spans_list = ner_model.bulk_predict(texts, BATCH_SIZE)
-    cit_spans_list, other_spans_list = _bulk_partition_spans(spans_list)
-
-    ref_part_input = reduce(lambda a, b: a + [(sub_b.text, b[0]) for sub_b in b[1]], enumerate(cit_spans_list), [])
-    all_raw_ref_part_spans = list(ref_part_model.bulk_predict_as_tuples(ref_part_input, BATCH_SIZE))
-    all_raw_ref_part_span_map = defaultdict(list)
-    for ref_part_span, input_idx in all_raw_ref_part_spans:
-        all_raw_ref_part_span_map[input_idx] += [ref_part_span]
 
-    output = []
-    for input_idx, (cit_spans, other_spans) in enumerate(zip(cit_spans_list, other_spans_list)):
-        ref_parts_list = all_raw_ref_part_span_map[input_idx]
-        output += [(cit_spans, ref_parts_list, other_spans)]
-    return output
+    # Partition each text's spans and flatten citation texts with their owning
+    # text indices into two parallel lists, all in one linear pass. Keep this
+    # O(N): an earlier version built the flattened list with
+    # reduce(lambda a, b: a + [...]), which copies the whole accumulator per
+    # text and goes quadratic in the number of citation spans.
+    cit_spans_list, other_spans_list = [], []
+    cit_texts, owners = [], []
+    for input_idx, spans in enumerate(spans_list):
+        cit_spans, other_spans = _partition_spans(spans)
+        cit_spans_list.append(cit_spans)
+        other_spans_list.append(other_spans)
+        cit_texts.extend(span.text for span in cit_spans)
+        owners.extend([input_idx] * len(cit_spans))
+
+    # Group ref parts by owning text into a preallocated list; order within
+    # each text is preserved because bulk_predict_as_tuples keeps input order
+    ref_parts_by_text = [[] for _ in cit_spans_list]
+    for ref_part_spans, input_idx in ref_part_model.bulk_predict_as_tuples(list(zip(cit_texts, owners)), BATCH_SIZE):
+        ref_parts_by_text[input_idx].append(ref_part_spans)
+
+    return [
+        (cit_spans, ref_parts_by_text[input_idx], other_spans)
+        for input_idx, (cit_spans, other_spans) in enumerate(zip(cit_spans_list, other_spans_list))
+    ]
+
+
+def _bulk_get_linker_entities_pipelined(texts, ner_model, ref_part_model):
+    """
+    Like _bulk_get_linker_entities, but for BatchScheduler-wrapped models:
+    as each text's NER future resolves, its citation spans are submitted to the
+    ref_part scheduler immediately, so the ref_part model chews on early texts
+    while NER is still running on later ones. Each model runs on its own
+    scheduler thread, so the two stages genuinely overlap.
+
+    :param texts: A list of input texts to analyze.
+    :param ner_model: Scheduler-wrapped model for named entity recognition.
+    :param ref_part_model: Scheduler-wrapped model for reference part recognition.
+    :return: A list of (cit_spans, ref_parts_list, other_spans) tuples, one per text.
+    """
+    ner_futures = [ner_model.submit(text) for text in texts]
+    cit_spans_list, other_spans_list, ref_futures_list = [], [], []
+    for future in ner_futures:
+        cit_spans, other_spans = _partition_spans(future.result())
+        cit_spans_list.append(cit_spans)
+        other_spans_list.append(other_spans)
+        ref_futures_list.append([ref_part_model.submit(span.text) for span in cit_spans])
+    return [
+        (cit_spans, [ref_future.result() for ref_future in ref_futures], other_spans)
+        for cit_spans, ref_futures, other_spans in zip(cit_spans_list, ref_futures_list, other_spans_list)
+    ]
 
 
 def _serialize_linker_entities(cit_spans, ref_parts_list, other_spans, with_span_text=False):
-    serial = [span.serialize(with_span_text) for span in other_spans]
-    for span, ref_parts in zip(cit_spans, ref_parts_list):
-        serialized_span = span.serialize(with_span_text)
-        serialized_span['parts'] = [part.serialize(with_span_text) for part in ref_parts]
-        serial.append(serialized_span)
+    # with_span_text is constant per request, so bind it (and the serialize
+    # method lookup) into one callable up front rather than re-resolving both
+    # for every span; map with that callable runs the loop in C
+    serialize = methodcaller('serialize', with_span_text)
+    # Preallocate the output list so large responses index-assign into a
+    # right-sized buffer instead of growing it append by append
+    num_other = len(other_spans)
+    serial = [None] * (num_other + len(cit_spans))
+    serial[:num_other] = map(serialize, other_spans)
+    for j, (span, ref_parts) in enumerate(zip(cit_spans, ref_parts_list), start=num_other):
+        serialized_span = serialize(span)
+        serialized_span['parts'] = list(map(serialize, ref_parts))
+        serial[j] = serialized_span
     return {'entities': serial}
 
 
-def _bulk_serialize_linker_entities(results, with_span_text=False):
-    serial = []
-    for cit_spans, ref_parts_list, other_spans in results:
-        serial.append(_serialize_linker_entities(cit_spans, ref_parts_list, other_spans, with_span_text))
-    return {'results': serial}
@@ -0,0 +1,108 @@
+import time
+import queue
+import threading
+from typing import Any
+from concurrent.futures import Future
+
+
+class BatchScheduler:
+    """
+    Coalesces concurrent single-text predictions into batched model calls.
+
+    The underlying spaCy/HF pipelines are far more efficient on batches (GPU
+    utilization, tokenizer vectorization) than on one text at a time. A
+    dedicated worker thread drains the queue until either `batch_size` items
+    are collected or `max_wait_ms` has elapsed since the first item, then runs
+    one `bulk_predict` and resolves each caller's Future. Requires the WSGI
+    server to handle requests on multiple threads so there is something to
+    coalesce.
+    """
+
+    def __init__(self, model, batch_size: int = 32, max_wait_ms: float = 10.0):
+        """
+        :param model: An AbstractNER implementation whose bulk_predict is called on drained batches.
+        :param batch_size: Maximum number of texts per model call.
+        :param max_wait_ms: Maximum time to wait for a batch to fill, in milliseconds.
+        """
+        self.__model = model
+        self.__batch_size = batch_size
+        self.__max_wait = max_wait_ms / 1000.0
+        self.__queue = queue.Queue()
+        self.__worker = threading.Thread(target=self.__run, daemon=True)
+        self.__worker.start()
+
+    def submit(self, text: str) -> Future:
+        """
+        Enqueues a single text for prediction.
+
+        :param text: The input text to analyze.
+        :return: A Future resolving to the list of named entities found in the text.
+        """
+        future = Future()
+        self.__queue.put((text, future))
+        return future
+
+    def predict(self, text: str):
+        """
+        Blocking convenience wrapper around submit(); mirrors AbstractNER.predict.
+
+        :param text: The input text to analyze.
+        :return: A list of named entities found in the text.
+        """
+        return self.submit(text).result()
+
+    def bulk_predict(self, texts: list[str], batch_size: int = None):
+        """
+        Enqueues each text individually so they can coalesce with other
+        requests' texts; mirrors AbstractNER.bulk_predict. The scheduler's own
+        batch_size governs the model calls, so `batch_size` is ignored.
+
+        :param texts: A list of input texts to analyze.
+        :param batch_size: Ignored; present for interface compatibility.
+        :return: A list of lists, where each inner list contains named entities for the corresponding text.
+        """
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def bulk_predict_as_tuples(self, text__context: list[tuple[str, Any]], batch_size: int = None):
+        """
+        Like bulk_predict but preserves per-text context; mirrors
+        AbstractNER.bulk_predict_as_tuples.
+
+        :param text__context: A list of input texts paired with context information.
+        :param batch_size: Ignored; present for interface compatibility.
+        :return: A list of (named entities, context) tuples.
+        """
+        futures = [(self.submit(text), context) for text, context in text__context]
+        return [(future.result(), context) for future, context in futures]
+
+    def __run(self):
+        while True:
+            batch = [self.__queue.get()]
+            deadline = time.monotonic() + self.__max_wait
+            while len(batch) < self.__batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.__queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            texts = [text for text, _ in batch]
+            try:
+                results = self.__model.bulk_predict(texts, len(texts))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            if len(results) != len(batch):
+                # Never leave a future unresolved — a silent mismatch would
+                # hang its caller forever on Future.result()
+                mismatch = ValueError(
+                    f"bulk_predict returned {len(results)} results for {len(batch)} inputs"
+                )
+                for _, future in batch:
+                    future.set_exception(mismatch)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
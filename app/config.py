@@ -1,4 +1,8 @@
 class BaseConfig:
+    # Bound request body size so oversized bulk payloads are rejected instead
+    # of buffered into memory
+    MAX_CONTENT_LENGTH = 32 * 1024 * 1024
+
     # Define at most 4 models, one for each language and type
     # 'arch' is the architecture of the model, e.g., 'spacy' or 'huggingface'
     # 'lang' is the language of the model, e.g., 'he' for Hebrew or 'en' for English
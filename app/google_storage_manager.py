@@ -1,12 +1,18 @@
 from flask import current_app
 from google.cloud import storage
 from io import BytesIO
+from pathlib import Path
+from filelock import FileLock
+import hashlib
+import os
 import re
 import tarfile
 
 
 class GoogleStorageManager(object):
 
+    DEFAULT_MODEL_CACHE = '/var/cache/models'
+
     @classmethod
     def get_bucket(cls, bucket_name):
         if getattr(cls, 'client', None) is None:
@@ -30,12 +36,49 @@ class GoogleStorageManager(object):
         blob = bucket.blob(filename)
         return BytesIO(blob.download_as_bytes())
 
-    @staticmethod
-    def get_tar_buffer(path: str):
-        # file is located in Google Cloud
-        # file is expected to be a tar.gz of the contents of the model folder (not the folder itself)
+    @classmethod
+    def get_model_dir(cls, path: str) -> str:
+        """
+        Downloads and extracts the model tarball at `path` into a shared
+        content-addressed on-disk cache and returns the extracted directory.
+
+        The cache root comes from the MODEL_CACHE env var (default
+        /var/cache/models) and each model lives under the sha256 of its gs://
+        path. Extraction is guarded by a file lock plus a .done marker, so
+        concurrent workers extract exactly once and every later load reuses
+        (and mmap-shares) the same files instead of re-extracting into a
+        per-process temp dir.
+
+        @param path: gs:// URI of a tar.gz of the contents of the model folder
+        @return: path to the extracted model directory
+        """
+        cache_root = Path(os.environ.get('MODEL_CACHE', cls.DEFAULT_MODEL_CACHE))
+        cache_dir = cache_root / hashlib.sha256(path.encode()).hexdigest()
+        done_marker = cache_dir / '.done'
+        if done_marker.exists():
+            return str(cache_dir)
+        cache_root.mkdir(parents=True, exist_ok=True)
+        with FileLock(f"{cache_dir}.lock"):
+            if not done_marker.exists():
+                cache_dir.mkdir(exist_ok=True)
+                cls.extract_tar(path, cache_dir)
+                done_marker.touch()
+        return str(cache_dir)
+
+    @classmethod
+    def extract_tar(cls, path: str, dest):
+        """
+        Streams the tar.gz blob at `path` and extracts it into `dest`
+        @param path: gs:// URI of a tar.gz of the contents of the model folder (not the folder itself)
+        @param dest: directory to extract into
+
+        tarfile's streaming mode ('r|gz') processes entries as bytes arrive
+        from the blob, so download and extraction overlap and peak memory
+        stays at one read chunk instead of the whole archive.
+        """
         match = re.match(r"gs://([^/]+)/(.+)$", path)
         bucket_name = match.group(1)
         blob_name = match.group(2)
-        model_buffer = GoogleStorageManager.get_filename(blob_name, bucket_name)
-        return tarfile.open(fileobj=model_buffer)
+        blob = cls.get_bucket(bucket_name).blob(blob_name)
+        with blob.open('rb') as stream, tarfile.open(fileobj=stream, mode='r|gz') as tar:
+            tar.extractall(dest)